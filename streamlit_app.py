@@ -1,22 +1,27 @@
 
 import streamlit as st
-import io
+import asyncio
+import codecs
+import hashlib
+import importlib
 import os
+import queue
+import re
+import shelve
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from openai import OpenAI
 
-# Try to import document processing libraries
-try:
-    from PyPDF2 import PdfReader
-    PDF_AVAILABLE = True
-except ImportError:
-    PDF_AVAILABLE = False
-
-try:
-    from docx import Document as DocxDocument
-    DOCX_AVAILABLE = True
-except ImportError:
-    DOCX_AVAILABLE = False
+# Document parsers, tiktoken and openai are imported on first use rather
+# than here, so reruns that never touch them don't pay for loading them
+def _optional_import(name):
+    """Import a module, or return None if it isn't installed"""
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
 
 # Page configuration
 st.set_page_config(
@@ -26,45 +31,13 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Custom CSS
-st.markdown("""
-<style>
-    .main-header {
-        font-size: 2.5rem;
-        font-weight: bold;
-        color: #1F77B4;
-        text-align: center;
-        margin-bottom: 1rem;
-    }
-    .sub-header {
-        font-size: 1.2rem;
-        color: #555;
-        text-align: center;
-        margin-bottom: 2rem;
-    }
-    .insight-box {
-        background-color: #f0f7ff;
-        border-left: 5px solid #1F77B4;
-        padding: 1rem;
-        border-radius: 5px;
-        margin: 1rem 0;
-    }
-    .success-box {
-        background-color: #d4edda;
-        border-left: 5px solid #28a745;
-        padding: 1rem;
-        border-radius: 5px;
-        margin: 1rem 0;
-    }
-    .warning-box {
-        background-color: #fff3cd;
-        border-left: 5px solid #ffc107;
-        padding: 1rem;
-        border-radius: 5px;
-        margin: 1rem 0;
-    }
-</style>
-""", unsafe_allow_html=True)
+# Custom CSS, shipped as style.css next to this script and read once per process
+@st.cache_resource
+def _load_css():
+    with open(os.path.join(os.path.dirname(__file__), "style.css"), encoding="utf-8") as f:
+        return f.read()
+
+st.markdown(f"<style>{_load_css()}</style>", unsafe_allow_html=True)
 
 # Header
 st.markdown('<div class="main-header">ðŸ“„ Document Insights Generator</div>', unsafe_allow_html=True)
@@ -88,7 +61,7 @@ with st.sidebar:
     st.markdown("""
     1. Enter your OpenAI API key above
     2. Upload your document (PDF, DOCX, TXT)
-    3. Ask a question about the document
+    3. Ask one or more questions (one per line)
     4. Click 'Generate Insights'
     5. View and download your results
     """)
@@ -121,86 +94,623 @@ with st.sidebar:
     st.markdown("[GitHub Repository](https://github.com)")
 
 # Helper Functions
-def extract_text_from_pdf(file_bytes):
-    """Extract text from PDF file"""
+def _pdf_page_text(pymupdf, page):
+    """Plain text of a PyMuPDF page; pages without fonts (scans, images) are skipped"""
+    # A page that references no fonts has no text layer, and listing its
+    # font resources is much cheaper than interpreting its content stream
+    if not page.get_fonts():
+        return ""
+    # PyMuPDF's default text flags minus ligature preservation, so the LLM
+    # reads "fi" rather than U+FB01; glyphs without a Unicode mapping still
+    # come out as their CID instead of U+FFFD
+    return page.get_text("text", flags=pymupdf.TEXTFLAGS_TEXT & ~pymupdf.TEXT_PRESERVE_LIGATURES)
+
+def extract_text_from_pdf(file_obj):
+    """Extract text from a PDF file object"""
     try:
-        if not PDF_AVAILABLE:
-            return "PDF support not available. Please install PyPDF2."
-
-        pdf_reader = PdfReader(io.BytesIO(file_bytes))
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
-        return text.strip()
+        # PyMuPDF 1.24.3+ is importable as pymupdf; the legacy fitz name
+        # prints a deprecation warning on recent releases
+        pymupdf = _optional_import("pymupdf") or _optional_import("fitz")
+        pypdf2 = None if pymupdf else _optional_import("PyPDF2")
+        if not pymupdf and not pypdf2:
+            return "PDF support not available. Please install PyMuPDF."
+
+        if pymupdf:
+            # MuPDF parses and decodes in C; close promptly so the mapped
+            # document isn't held across Streamlit reruns. getvalue() hands
+            # back the upload's own buffer on a BytesIO, not a copy. Pages
+            # are read in order; PyMuPDF is single-threaded and holds the GIL
+            doc = pymupdf.open(stream=file_obj.getvalue(), filetype="pdf")
+            try:
+                return "\n".join(_pdf_page_text(pymupdf, page) for page in doc).strip()
+            finally:
+                doc.close()
+
+        # Fall back to the pure-Python parser
+        pdf_reader = pypdf2.PdfReader(file_obj)
+        parts = [page.extract_text() or "" for page in pdf_reader.pages]
+        return "\n".join(parts).strip()
     except Exception as e:
         return f"Error extracting PDF: {str(e)}"
 
-def extract_text_from_docx(file_bytes):
-    """Extract text from DOCX file"""
+def extract_text_from_docx(file_obj):
+    """Extract text from a DOCX file object"""
     try:
-        if not DOCX_AVAILABLE:
+        docx = _optional_import("docx")
+        if not docx:
             return "DOCX support not available. Please install python-docx."
 
-        doc = DocxDocument(io.BytesIO(file_bytes))
-        text = "\n".join([para.text for para in doc.paragraphs])
-        return text.strip()
+        from docx.oxml.ns import qn
+
+        doc = docx.Document(file_obj)
+        # Walk the paragraph XML directly instead of building a python-docx
+        # Paragraph and Run wrapper for every paragraph and run. Like
+        # Paragraph.text, only the direct children of the paragraph's runs
+        # (and of runs inside hyperlinks) are read: tab-stop definitions in
+        # w:pPr and text-box copies inside mc:AlternateContent are not text
+        text_tag = qn("w:t")
+        br_tag = qn("w:br")
+        br_type = qn("w:type")
+        inner = {qn("w:tab"): "\t", qn("w:ptab"): "\t", qn("w:cr"): "\n", qn("w:noBreakHyphen"): "-"}
+
+        def run_text(r):
+            for el in r.iterchildren():
+                if el.tag == text_tag:
+                    yield el.text or ""
+                elif el.tag == br_tag:
+                    # Page and column breaks carry no text
+                    yield "\n" if el.get(br_type, "textWrapping") == "textWrapping" else ""
+                elif el.tag in inner:
+                    yield inner[el.tag]
+
+        paragraphs = (
+            "".join(text for r in p.xpath("w:r | w:hyperlink/w:r") for text in run_text(r))
+            for p in doc.element.body.iterchildren(qn("w:p"))
+        )
+        return "\n".join(paragraphs).strip()
     except Exception as e:
         return f"Error extracting DOCX: {str(e)}"
 
-def extract_text_from_txt(file_bytes):
-    """Extract text from TXT file"""
+# Plain text is decoded in blocks and read no further than a document we
+# would still map-reduce (~500k tokens), however large the file is
+TXT_READ_SIZE = 4 * 1024 * 1024
+MAX_TXT_CHARS = 2_000_000
+
+def extract_text_from_txt(file_obj):
+    """Extract text from a TXT file object"""
     try:
-        return file_bytes.decode('utf-8', errors='ignore').strip()
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+        parts = []
+        length = 0
+        while length <= MAX_TXT_CHARS:
+            block = file_obj.read(TXT_READ_SIZE)
+            if not block:
+                parts.append(decoder.decode(b'', final=True))
+                break
+            parts.append(decoder.decode(block))
+            length += len(parts[-1])
+
+        text = "".join(parts)
+        if len(text) > MAX_TXT_CHARS:
+            text = text[:MAX_TXT_CHARS] + "\n\n[Document truncated for processing...]"
+        return text.strip()
     except Exception as e:
         return f"Error extracting TXT: {str(e)}"
 
-def extract_text(uploaded_file):
-    """Extract text based on file type"""
-    file_bytes = uploaded_file.read()
+# File signatures, checked before the upload's name and MIME type. MuPDF
+# accepts a BOM or whitespace ahead of "%PDF", so the marker may follow
+# those within the first SIGNATURE_BYTES; any other bytes before it (a text
+# file that mentions "%PDF") leave the choice to the name and MIME type,
+# which also catch PDFs with other junk in front. DOCX files are ZIP archives
+SIGNATURE_BYTES = 1024
+PDF_SIGNATURE = b"%PDF"
+ZIP_SIGNATURE = b"PK\x03\x04"
+UTF8_BOM = b"\xef\xbb\xbf"
+
+def _extractor_by_signature(head):
+    """Extractor for an upload's leading bytes, or None if no signature matches"""
+    offset = head.find(PDF_SIGNATURE)
+    if offset != -1 and not head[:offset].replace(UTF8_BOM, b"").strip():
+        return extract_text_from_pdf
+    if head.startswith(ZIP_SIGNATURE):
+        return extract_text_from_docx
+    return None
+
+def _extractor_by_type(uploaded_file):
+    """Extractor for an upload's MIME type or extension, or None if unsupported"""
     file_type = uploaded_file.type
+    name = uploaded_file.name.lower()
+    if file_type == "application/pdf" or name.endswith('.pdf'):
+        return extract_text_from_pdf
+    elif file_type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document" or name.endswith('.docx'):
+        return extract_text_from_docx
+    elif file_type == "text/plain" or name.endswith('.txt'):
+        return extract_text_from_txt
+    return None
+
+def _pick_extractor(uploaded_file):
+    """Extractor for an upload by its magic bytes, then its name and MIME type"""
+    # Peek at the signature only, so the parsers can be handed the upload
+    # itself and the document is never copied into a second buffer
+    uploaded_file.seek(0)
+    head = uploaded_file.read(SIGNATURE_BYTES)
+    uploaded_file.seek(0)
+    return _extractor_by_signature(head) or _extractor_by_type(uploaded_file)
+
+# Inputs this large are hashed as fixed-size slices on a thread pool
+# (hashlib releases the GIL while digesting) and the slice digests hashed
+# again, using blake2b's tree parameters. The slice size is fixed so a
+# document's key doesn't depend on the machine's core count, and the tree
+# parameters keep a tree key from colliding with the flat hash of the
+# concatenated slice digests
+PARALLEL_HASH_MIN_BYTES = 32 * 1024 * 1024
+HASH_SLICE_BYTES = 8 * 1024 * 1024
+FINGERPRINT_BYTES = 16
+
+def _fingerprint(data):
+    """128-bit blake2b hex digest of a bytes-like object, used for cache keys"""
+    view = memoryview(data)
+    if view.nbytes < PARALLEL_HASH_MIN_BYTES:
+        return hashlib.blake2b(view, digest_size=FINGERPRINT_BYTES).hexdigest()
+
+    slices = [view[i:i + HASH_SLICE_BYTES] for i in range(0, view.nbytes, HASH_SLICE_BYTES)]
+    tree = dict(digest_size=FINGERPRINT_BYTES, fanout=0, depth=2, leaf_size=HASH_SLICE_BYTES, inner_size=FINGERPRINT_BYTES)
+
+    def leaf(index):
+        return hashlib.blake2b(
+            slices[index], node_offset=index, node_depth=0,
+            last_node=index == len(slices) - 1, **tree
+        ).digest()
+
+    workers = min(8, os.cpu_count() or 1, len(slices))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        digests = executor.map(leaf, range(len(slices)))
+        root = hashlib.blake2b(node_offset=0, node_depth=1, last_node=True, **tree)
+        for digest in digests:
+            root.update(digest)
+        return root.hexdigest()
+
+def _hash_upload(uploaded_file):
+    """Cache key for an upload: a digest of its contents, not its name"""
+    return _fingerprint(uploaded_file.getvalue())
+
+# Extracted text is cached in the browser session, not the process, so it
+# goes away with the session; only the last few documents are kept
+EXTRACT_CACHE_ENTRIES = 4
 
-    if file_type == "application/pdf" or uploaded_file.name.endswith('.pdf'):
-        return extract_text_from_pdf(file_bytes)
-    elif file_type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document" or uploaded_file.name.endswith('.docx'):
-        return extract_text_from_docx(file_bytes)
-    elif file_type == "text/plain" or uploaded_file.name.endswith('.txt'):
-        return extract_text_from_txt(file_bytes)
+def extract_text(uploaded_file):
+    """Extract text based on the file's magic bytes, then its name and MIME type"""
+    key = _hash_upload(uploaded_file)
+    text = st.session_state.text_cache.get(key)
+    if text is None:
+        extractor = _pick_extractor(uploaded_file)
+        if extractor is None:
+            return "Unsupported file format. Please upload PDF, DOCX, or TXT files."
+        text = extractor(uploaded_file)
+        st.session_state.text_cache[key] = text
+        while len(st.session_state.text_cache) > EXTRACT_CACHE_ENTRIES:
+            del st.session_state.text_cache[next(iter(st.session_state.text_cache))]
+    return text
+
+# Client-side throttles, as in the OpenAI cookbook's parallel request processor
+MAX_REQUESTS_PER_MINUTE = 500
+MAX_TOKENS_PER_MINUTE = 90000
+MAX_OUTPUT_TOKENS = 1000
+
+# Several questions are answered in one request over one copy of the
+# document; the completion budget grows with the number of questions
+MAX_BATCHED_OUTPUT_TOKENS = 4000
+ANSWER_MARKER = re.compile(r"^[ \t*#]*Q(\d+)\s*[:.)]\**", re.MULTILINE)
+
+# Context window per model; a document is sent whole when it fits alongside
+# the prompt and the completion, and map-reduced otherwise
+MODEL_CONTEXT_TOKENS = {
+    "gpt-3.5-turbo": 16385,
+    "gpt-4": 8192,
+    "gpt-4-turbo": 128000,
+}
+DEFAULT_CONTEXT_TOKENS = 8192
+PROMPT_OVERHEAD_TOKENS = 500
+
+# Documents longer than one request can carry are split into overlapping
+# windows, summarized in parallel (map) and then answered from the notes (reduce)
+CHUNK_TOKENS = 2000
+CHUNK_OVERLAP_TOKENS = 125
+
+# In-flight map requests: about a second's worth of RPM, and no more than
+# the TPM budget can cover at one chunk per request
+MAX_CONCURRENT_REQUESTS = max(1, min(
+    MAX_REQUESTS_PER_MINUTE // 60,
+    MAX_TOKENS_PER_MINUTE // (CHUNK_TOKENS + MAX_OUTPUT_TOKENS)
+))
+
+SYSTEM_PROMPT = "You are a helpful assistant that provides clear, detailed document analysis."
+
+class RateLimiter:
+    """Token bucket over requests and tokens per minute, shared by concurrent calls"""
+
+    def __init__(self, max_requests_per_minute, max_tokens_per_minute):
+        self.max_requests = max_requests_per_minute
+        self.max_tokens = max_tokens_per_minute
+        self.available_requests = max_requests_per_minute
+        self.available_tokens = max_tokens_per_minute
+        self.last_update = time.monotonic()
+        # Created on first use, so it belongs to the shared event loop
+        # rather than to the script thread that built the limiter
+        self._lock = None
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.last_update
+        self.last_update = now
+        self.available_requests = min(self.max_requests, self.available_requests + self.max_requests * elapsed / 60)
+        self.available_tokens = min(self.max_tokens, self.available_tokens + self.max_tokens * elapsed / 60)
+
+    async def acquire(self, tokens):
+        """Wait until one request and `tokens` tokens of capacity are free"""
+        tokens = min(tokens, self.max_tokens)
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.available_requests >= 1 and self.available_tokens >= tokens:
+                    self.available_requests -= 1
+                    self.available_tokens -= tokens
+                    return
+                wait = max(
+                    (1 - self.available_requests) * 60 / self.max_requests,
+                    (tokens - self.available_tokens) * 60 / self.max_tokens,
+                )
+                await asyncio.sleep(wait)
+
+def _estimate_tokens(messages, max_tokens):
+    """Rough token cost of a request: ~4 characters per prompt token plus the completion"""
+    return sum(len(m["content"]) for m in messages) // 4 + max_tokens
+
+@st.cache_resource
+def _get_encoding(model_name):
+    """tiktoken encoding for a model, loaded once per process; None without tiktoken"""
+    tiktoken = _optional_import("tiktoken")
+    if not tiktoken:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+def _count_tokens(text, encoding):
+    if encoding is None:
+        return len(text) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+def _prompt_budget(model_name, max_tokens):
+    """Document tokens that fit in one request next to the prompt and the completion"""
+    context = MODEL_CONTEXT_TOKENS.get(model_name, DEFAULT_CONTEXT_TOKENS)
+    return context - max_tokens - PROMPT_OVERHEAD_TOKENS
+
+def _truncate_to_tokens(text, budget, encoding):
+    if encoding is None:
+        return text[:budget * 4]
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:budget])
+
+def _document_tokens(document_key, document_text, model_name, encoding):
+    """Token count of the current document, and its token ids if they had to be computed
+
+    Only the current document's count is kept in the session. The token ids
+    are returned for this call alone, so a document that is map-reduced
+    isn't encoded a second time to split it.
+    """
+    cached = st.session_state.document_tokens
+    if cached and cached[:2] == (document_key, model_name):
+        return cached[2], None
+    if encoding is None:
+        token_ids = None
+        tokens = _count_tokens(document_text, encoding)
+    else:
+        token_ids = encoding.encode(document_text, disallowed_special=())
+        tokens = len(token_ids)
+    st.session_state.document_tokens = (document_key, model_name, tokens)
+    return tokens, token_ids
+
+async def _chat_completion(client, limiter, messages, options, max_tokens):
+    await limiter.acquire(_estimate_tokens(messages, max_tokens))
+    response = await client.chat.completions.create(
+        messages=messages,
+        max_tokens=max_tokens,
+        **options
+    )
+    return response.choices[0].message.content
+
+async def _stream_completion(client, limiter, messages, options, max_tokens, on_text=None):
+    """Stream a chat completion, passing each new piece of text to `on_text` as it arrives"""
+    await limiter.acquire(_estimate_tokens(messages, max_tokens))
+    stream = await client.chat.completions.create(
+        messages=messages,
+        max_tokens=max_tokens,
+        stream=True,
+        **options
+    )
+    parts = []
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            parts.append(chunk.choices[0].delta.content)
+            if on_text:
+                on_text(parts[-1])
+    return "".join(parts)
+
+async def _gather_completions(client, limiter, message_lists, options, max_tokens=MAX_OUTPUT_TOKENS):
+    """Run several chat completions concurrently, returning replies in order"""
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+    async def run(messages):
+        async with semaphore:
+            return await _chat_completion(client, limiter, messages, options, max_tokens)
+
+    return await asyncio.gather(*(run(messages) for messages in message_lists))
+
+def _split_into_chunks(text, encoding, tokens=None):
+    """Split text into CHUNK_TOKENS windows that overlap by CHUNK_OVERLAP_TOKENS
+
+    `tokens` may carry the text's token ids when they are already known.
+    """
+    if encoding is None:
+        # Approximate with ~4 characters per token
+        size, overlap = CHUNK_TOKENS * 4, CHUNK_OVERLAP_TOKENS * 4
+        return [text[i:i + size] for i in range(0, max(len(text) - overlap, 1), size - overlap)]
+
+    if tokens is None:
+        tokens = encoding.encode(text, disallowed_special=())
+    step = CHUNK_TOKENS - CHUNK_OVERLAP_TOKENS
+    return [
+        encoding.decode(tokens[i:i + CHUNK_TOKENS])
+        for i in range(0, max(len(tokens) - CHUNK_OVERLAP_TOKENS, 1), step)
+    ]
+
+def _question_block(questions):
+    """Number the questions Q1:, Q2:, ... so their answers can be told apart"""
+    return "\n".join(f"Q{i}: {question}" for i, question in enumerate(questions, 1))
+
+def _map_messages(chunk, questions, part, total):
+    if len(questions) == 1:
+        ask = f"relevant to this question: {questions[0]}"
     else:
-        return "Unsupported file format. Please upload PDF, DOCX, or TXT files."
+        ask = f"relevant to any of these questions:\n{_question_block(questions)}"
 
-def generate_insights(document_text, question, api_key, model_name, temp):
-    """Generate insights using OpenAI API"""
-    try:
-        # Initialize OpenAI client
-        client = OpenAI(api_key=api_key)
+    document = f"""The following is part {part} of {total} of a longer document.
 
-        # Truncate if too long (to stay within token limits)
-        max_chars = 12000
-        if len(document_text) > max_chars:
-            document_text = document_text[:max_chars] + "\n\n[Document truncated for processing...]"
+Document part:
+{chunk}"""
 
-        # Create prompt
-        prompt = f"""You are a helpful AI assistant that analyzes documents and provides clear, detailed insights.
+    prompt = f"""Extract every fact, figure, and statement from the document part that is {ask}
 
-Read the following document carefully and answer this question: {question}
+List only information found in this part. If nothing in it is relevant, reply exactly: No relevant information."""
 
-Document:
-{document_text}
+    return _document_messages(document, prompt)
 
-Please provide a comprehensive answer based only on the information in the document. If the document doesn't contain enough information to answer the question, say so clearly."""
+def _document_messages(document, prompt):
+    """Fixed system prompt, then the document, then the question
 
-        # Call OpenAI API with new syntax
-        response = client.chat.completions.create(
-            model=model_name,
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that provides clear, detailed document analysis."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=1000,
-            temperature=temp
-        )
+    Everything before the question is byte-identical across questions on
+    the same document, which is what OpenAI's automatic prompt caching
+    (prefixes of 1 024+ tokens) needs to reuse it.
+    """
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": document},
+        {"role": "user", "content": prompt}
+    ]
+
+def _answer_messages(document_text, questions, from_notes):
+    if from_notes:
+        source = "notes extracted from consecutive parts of a long document"
+        label = "Notes"
+    else:
+        source = "document"
+        label = "Document"
 
-        return response.choices[0].message.content
+    if len(questions) == 1:
+        ask = f"answer this question: {questions[0]}"
+        layout = ""
+    else:
+        ask = f"answer each of these questions separately:\n{_question_block(questions)}"
+        layout = "\n\nStart each answer on a new line with its marker (Q1:, Q2:, ...) and answer every question."
+
+    document = f"""{label}:
+{document_text}"""
+
+    prompt = f"""You are a helpful AI assistant that analyzes documents and provides clear, detailed insights.
+
+Read the {source} above carefully and {ask}
+
+Please provide a comprehensive answer based only on the information in the document. If the document doesn't contain enough information to answer the question, say so clearly.{layout}"""
+
+    return _document_messages(document, prompt)
+
+def _split_answers(reply, questions):
+    """Demultiplex a batched reply by its Q#: markers into one section per question"""
+    if len(questions) == 1:
+        return reply
+
+    answers = [None] * len(questions)
+    markers = list(ANSWER_MARKER.finditer(reply))
+    for marker, following in zip(markers, markers[1:] + [None]):
+        index = int(marker.group(1)) - 1
+        if 0 <= index < len(questions):
+            answers[index] = reply[marker.end():following.start() if following else len(reply)].strip()
+
+    if not any(answers):
+        # The model ignored the markers; show its reply as-is
+        return reply
+
+    return "\n\n".join(
+        f"**Q{i}: {question}**\n\n{answer or '_No answer returned._'}"
+        for i, (question, answer) in enumerate(zip(questions, answers), 1)
+    )
+
+async def _generate_insights(client, limiter, document_text, tokens, token_ids, questions, options, encoding, on_text=None):
+    # Map: condense each window to what is relevant to the question, in
+    # parallel, repeating over the notes until they fit in one request
+    max_tokens = min(MAX_OUTPUT_TOKENS * len(questions), MAX_BATCHED_OUTPUT_TOKENS)
+    budget = _prompt_budget(options["model"], max_tokens)
+    from_notes = False
+    while tokens > budget:
+        chunks = _split_into_chunks(document_text, encoding, token_ids)
+        token_ids = None
+        notes = await _gather_completions(
+            client, limiter,
+            [_map_messages(chunk, questions, i, len(chunks)) for i, chunk in enumerate(chunks, 1)],
+            options
+        )
+        notes_text = "\n\n".join(notes)
+        notes_tokens = _count_tokens(notes_text, encoding)
+        from_notes = True
+        if notes_tokens >= tokens:
+            # The notes stopped shrinking; cut them rather than loop forever
+            document_text = _truncate_to_tokens(notes_text, budget, encoding) + "\n\n[Notes truncated for processing...]"
+            break
+        document_text, tokens = notes_text, notes_tokens
+
+    # Reduce: answer every question from the document itself or the
+    # combined notes, streaming the reply as it is generated
+    reply = await _stream_completion(
+        client, limiter, _answer_messages(document_text, questions, from_notes),
+        options, max_tokens, on_text
+    )
+    return _split_answers(reply, questions)
+
+@st.cache_resource
+def _get_event_loop():
+    """Event loop shared by every session, run on a daemon thread
+
+    Streamlit reruns the script on each interaction; keeping one loop alive
+    lets pooled HTTPS connections (bound to their loop) outlive a rerun.
+    """
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="openai-event-loop", daemon=True).start()
+    return loop
+
+@st.cache_resource(max_entries=32)
+def _get_client(api_key):
+    """AsyncOpenAI client per API key; its connection pool pays TLS setup once per process"""
+    from openai import AsyncOpenAI
+
+    return AsyncOpenAI(api_key=api_key)
+
+@st.cache_resource(max_entries=32)
+def _get_rate_limiter(api_key):
+    """RateLimiter per API key, so every click and session on that key shares one budget"""
+    return RateLimiter(MAX_REQUESTS_PER_MINUTE, MAX_TOKENS_PER_MINUTE)
+
+def _run_on_event_loop(make_coro, on_text=None):
+    """Run a coroutine on the shared loop, relaying its progress to `on_text` here
+
+    Streamlit elements are only updated from the script thread, so the
+    coroutine queues each new piece of text (via the callback `make_coro`
+    receives) and this thread collects them, joining the text so far only
+    when it renders, once per batch of pieces it has caught up on.
+    """
+    updates = queue.Queue()
+    future = asyncio.run_coroutine_threadsafe(make_coro(updates.put), _get_event_loop())
+    parts = []
+    try:
+        while not (future.done() and updates.empty()):
+            try:
+                parts.append(updates.get(timeout=0.05))
+            except queue.Empty:
+                continue
+            while not updates.empty():
+                parts.append(updates.get_nowait())
+            if on_text:
+                on_text("".join(parts))
+        return future.result()
+    finally:
+        # Stop the requests if the user interrupted this run
+        future.cancel()
+
+# Set INSIGHTS_CACHE_FILE to also keep answers on disk across sessions;
+# by default they live only in the browser session. Answers quote the
+# document, so the file keeps each one for a limited time and holds a
+# bounded number of them, dropping the oldest first
+INSIGHTS_CACHE_FILE = os.environ.get("INSIGHTS_CACHE_FILE")
+INSIGHTS_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+INSIGHTS_CACHE_MAX_ENTRIES = 1000
+
+@st.cache_resource
+def _insights_file_lock():
+    return threading.Lock()
+
+def _insights_cache_key(document_key, questions, model_name, temp):
+    return _fingerprint(repr((document_key, questions, model_name, temp)).encode("utf-8"))
+
+def _is_fresh(entry, now):
+    """Whether a (stored_at, insights) entry from the cache file is still valid"""
+    return isinstance(entry, tuple) and now - entry[0] < INSIGHTS_CACHE_TTL_SECONDS
+
+def _prune_insights_file(db):
+    """Drop expired answers, then the oldest, leaving room for new ones"""
+    now = time.time()
+    stored_at = {}
+    for key in list(db.keys()):
+        entry = db[key]
+        if _is_fresh(entry, now):
+            stored_at[key] = entry[0]
+        else:
+            del db[key]
+    # Prune to three quarters of the limit so this full scan isn't repeated on every store
+    excess = len(stored_at) - INSIGHTS_CACHE_MAX_ENTRIES * 3 // 4
+    for key in sorted(stored_at, key=stored_at.get)[:max(excess, 0)]:
+        del db[key]
+
+def _load_cached_insights(key):
+    insights = st.session_state.insights_cache.get(key)
+    if insights is None and INSIGHTS_CACHE_FILE:
+        with _insights_file_lock(), shelve.open(INSIGHTS_CACHE_FILE) as db:
+            entry = db.get(key)
+            if entry is not None and not _is_fresh(entry, time.time()):
+                del db[key]
+                entry = None
+        if entry is not None:
+            insights = entry[1]
+            st.session_state.insights_cache[key] = insights
+    return insights
+
+def _store_cached_insights(key, insights):
+    st.session_state.insights_cache[key] = insights
+    if INSIGHTS_CACHE_FILE:
+        with _insights_file_lock(), shelve.open(INSIGHTS_CACHE_FILE) as db:
+            db[key] = (time.time(), insights)
+            if len(db) > INSIGHTS_CACHE_MAX_ENTRIES:
+                _prune_insights_file(db)
+
+def generate_insights(document_text, questions, api_key, model_name, temp, on_text=None):
+    """Generate insights for one or more questions in a single request, map-reducing long documents
+
+    `on_text` is called with the partial answer while it streams in.
+    """
+    try:
+        # The document is fingerprinted once per call and the digest shared
+        # by the answer cache and the token count
+        document_key = _fingerprint(document_text.encode("utf-8"))
+        # Only successful answers are cached, so errors are retried next time
+        key = _insights_cache_key(document_key, questions, model_name, temp)
+        insights = _load_cached_insights(key)
+        if insights is None:
+            # A stable per-session `user` keeps this session's requests on
+            # the same prompt cache instead of fragmenting it
+            options = {"model": model_name, "temperature": temp, "user": st.session_state.session_hash}
+            client = _get_client(api_key)
+            limiter = _get_rate_limiter(api_key)
+            encoding = _get_encoding(model_name)
+            tokens, token_ids = _document_tokens(document_key, document_text, model_name, encoding)
+            insights = _run_on_event_loop(
+                lambda relay: _generate_insights(
+                    client, limiter, document_text, tokens, token_ids, questions, options, encoding, relay
+                ),
+                on_text
+            )
+            _store_cached_insights(key, insights)
+        return insights
 
     except Exception as e:
         error_msg = str(e)
@@ -215,6 +725,44 @@ Please provide a comprehensive answer based only on the information in the docum
         else:
             return f"âŒ Error generating insights: {error_msg}"
 
+# Download payloads are built once per answer rather than on every rerun
+def build_txt_download(filename, question, generated, insights, document_text):
+    """Plain-text report of an answer with an excerpt of the document"""
+    return f"""Document: {filename}
+Question: {question}
+Generated: {generated}
+
+{'='*80}
+
+INSIGHTS:
+
+{insights}
+
+{'='*80}
+
+Document Text (excerpt):
+{document_text[:2000]}...
+"""
+
+def build_md_download(filename, question, generated, insights):
+    """Markdown report of an answer"""
+    return f"""# Document Insights
+
+**Document:** {filename}  
+**Question:** {question}  
+**Generated:** {generated}
+
+---
+
+## Insights
+
+{insights}
+
+---
+
+*Generated by Document Insights Generator*
+"""
+
 # Initialize session state
 if 'document_text' not in st.session_state:
     st.session_state.document_text = None
@@ -222,6 +770,16 @@ if 'insights' not in st.session_state:
     st.session_state.insights = None
 if 'filename' not in st.session_state:
     st.session_state.filename = None
+if 'downloads' not in st.session_state:
+    st.session_state.downloads = None
+if 'text_cache' not in st.session_state:
+    st.session_state.text_cache = {}
+if 'insights_cache' not in st.session_state:
+    st.session_state.insights_cache = {}
+if 'document_tokens' not in st.session_state:
+    st.session_state.document_tokens = None
+if 'session_hash' not in st.session_state:
+    st.session_state.session_hash = uuid.uuid4().hex
 
 # Main content area
 st.markdown("## ðŸ“¤ Upload Your Document")
@@ -270,36 +828,54 @@ if st.session_state.document_text:
         """)
 
     question = st.text_area(
-        "Type your question here:",
+        "Type your question here (one per line to ask several at once):",
         height=100,
         placeholder="e.g., What are the main findings in this document?"
     )
+    questions = [line.strip() for line in question.splitlines() if line.strip()]
 
     # Generate insights button
     if st.button("ðŸ¤– Generate Insights", type="primary"):
         if not openai_api_key:
             st.error("âš ï¸ Please enter your OpenAI API key in the sidebar.")
-        elif not question:
+        elif not questions:
             st.error("âš ï¸ Please enter a question.")
         else:
             with st.spinner("ðŸ¤– AI is analyzing your document... This may take 10-30 seconds."):
+                # Show the answer as it streams in; the Insights section
+                # below takes over once it is complete
+                stream_placeholder = st.empty()
                 insights = generate_insights(
                     st.session_state.document_text,
-                    question,
+                    questions,
                     openai_api_key,
                     model,
-                    temperature
+                    temperature,
+                    on_text=stream_placeholder.markdown
                 )
+                stream_placeholder.empty()
                 st.session_state.insights = insights
-                st.session_state.question = question
+                st.session_state.question = "; ".join(questions)
+
+                generated = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                st.session_state.downloads = {
+                    "txt": build_txt_download(
+                        st.session_state.filename, st.session_state.question, generated,
+                        insights, st.session_state.document_text
+                    ),
+                    "md": build_md_download(
+                        st.session_state.filename, st.session_state.question, generated, insights
+                    ),
+                }
 
 # Display insights
 if st.session_state.insights:
     st.markdown("---")
     st.markdown("## ðŸŽ¯ Insights")
 
-    # Display in a nice box
-    st.markdown(f'<div class="insight-box">{st.session_state.insights}</div>', unsafe_allow_html=True)
+    # Display in a nice box; plain markdown, so the answer is never parsed as HTML
+    with st.container(border=True):
+        st.markdown(st.session_state.insights)
 
     # Download options
     st.markdown("### ðŸ’¾ Download Results")
@@ -307,52 +883,17 @@ if st.session_state.insights:
     col1, col2 = st.columns(2)
 
     with col1:
-        # Create downloadable text file
-        result_text = f"""Document: {st.session_state.filename}
-Question: {st.session_state.question}
-Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-
-{'='*80}
-
-INSIGHTS:
-
-{st.session_state.insights}
-
-{'='*80}
-
-Document Text (excerpt):
-{st.session_state.document_text[:2000]}...
-"""
-
         st.download_button(
             label="ðŸ“„ Download as TXT",
-            data=result_text,
+            data=st.session_state.downloads["txt"],
             file_name=f"{st.session_state.filename}_insights.txt",
             mime="text/plain"
         )
 
     with col2:
-        # Create markdown version
-        markdown_text = f"""# Document Insights
-
-**Document:** {st.session_state.filename}  
-**Question:** {st.session_state.question}  
-**Generated:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-
----
-
-## Insights
-
-{st.session_state.insights}
-
----
-
-*Generated by Document Insights Generator*
-"""
-
         st.download_button(
             label="ðŸ“ Download as MD",
-            data=markdown_text,
+            data=st.session_state.downloads["md"],
             file_name=f"{st.session_state.filename}_insights.md",
             mime="text/markdown"
         )
@@ -361,14 +902,18 @@ Document Text (excerpt):
     if st.button("ðŸ”„ Analyze Another Document"):
         st.session_state.document_text = None
         st.session_state.insights = None
+        st.session_state.downloads = None
         st.session_state.filename = None
         st.rerun()
 
 # Footer
+retention = "Documents and answers are kept only for your browser session"
+if INSIGHTS_CACHE_FILE:
+    retention += f"; answers are also cached on the server for up to {INSIGHTS_CACHE_TTL_SECONDS // 86400} days"
 st.markdown("---")
-st.markdown("""
+st.markdown(f"""
 <div style='text-align: center; color: #666; padding: 2rem 0;'>
     <p>Built with â¤ï¸ using Streamlit and OpenAI</p>
-    <p>No data is stored - everything happens in your browser session</p>
+    <p>{retention}</p>
 </div>
 """, unsafe_allow_html=True)
@@ -0,0 +1,76 @@
+import io
+import os
+import sys
+
+import pytest
+
+docx = pytest.importorskip("docx")
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls
+from docx.shared import Inches
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from streamlit_app import extract_text_from_docx
+
+TEXT_BOX_NS = (
+    'xmlns:mc="http://schemas.openxmlformats.org/markup-compatibility/2006" '
+    'xmlns:wps="http://schemas.microsoft.com/office/word/2010/wordprocessingShape" '
+    'xmlns:v="urn:schemas-microsoft-com:vml"'
+)
+
+# A text box as Word saves it: the same content under Choice and Fallback
+TEXT_BOX_RUN = f"""
+<w:r {nsdecls("w")} {TEXT_BOX_NS}>
+  <mc:AlternateContent>
+    <mc:Choice Requires="wps">
+      <w:drawing><wps:txbx><w:txbxContent>
+        <w:p><w:r><w:t>BOXTEXT</w:t></w:r></w:p>
+      </w:txbxContent></wps:txbx></w:drawing>
+    </mc:Choice>
+    <mc:Fallback>
+      <w:pict><v:textbox><w:txbxContent>
+        <w:p><w:r><w:t>BOXTEXT</w:t></w:r></w:p>
+      </w:txbxContent></v:textbox></w:pict>
+    </mc:Fallback>
+  </mc:AlternateContent>
+</w:r>
+"""
+
+HYPERLINK = f"""
+<w:hyperlink {nsdecls("w", "r")} r:id="rId99">
+  <w:r><w:t xml:space="preserve"> link</w:t></w:r>
+</w:hyperlink>
+"""
+
+
+def _fixture():
+    document = docx.Document()
+    document.add_paragraph("Header")
+
+    tabbed = document.add_paragraph("Name\tValue")
+    tabbed.paragraph_format.tab_stops.add_tab_stop(Inches(2))
+
+    host = document.add_paragraph("Host")
+    host._p.append(parse_xml(TEXT_BOX_RUN))
+    host._p.append(parse_xml(HYPERLINK))
+
+    broken = document.add_paragraph("Before")
+    broken.add_run().add_break(docx.enum.text.WD_BREAK.PAGE)
+    broken.add_run("After")
+    broken.add_run().add_break()
+    broken.add_run("Line")
+
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer
+
+
+def test_docx_text_matches_paragraph_text():
+    buffer = _fixture()
+    expected = "\n".join(p.text for p in docx.Document(io.BytesIO(buffer.getvalue())).paragraphs).strip()
+
+    text = extract_text_from_docx(buffer)
+
+    assert text == expected
+    assert "\tName" not in text
+    assert "BOXTEXT" not in text
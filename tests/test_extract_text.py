@@ -0,0 +1,43 @@
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from streamlit_app import extract_text_from_pdf, extract_text_from_txt, _pick_extractor
+
+
+class Upload(io.BytesIO):
+    """Stand-in for Streamlit's UploadedFile: a BytesIO with a name and MIME type"""
+
+    def __init__(self, data, name, type):
+        super().__init__(data)
+        self.name = name
+        self.type = type
+
+
+def _pdf_bytes(text):
+    pymupdf = pytest.importorskip("pymupdf")
+    doc = pymupdf.open()
+    doc.new_page().insert_text((72, 72), text)
+    return doc.tobytes()
+
+
+def test_text_mentioning_pdf_header_is_read_as_text():
+    data = b"Some notes.\nA PDF starts with the header %PDF-1.7 and ends with %%EOF.\n"
+    upload = Upload(data, "notes.txt", "text/plain")
+
+    extractor = _pick_extractor(upload)
+
+    assert extractor is extract_text_from_txt
+    assert extractor(upload) == data.decode().strip()
+
+
+def test_pdf_with_bom_prefix_is_read_as_pdf():
+    upload = Upload(b"\xef\xbb\xbf\r\n" + _pdf_bytes("hello pdf"), "upload", "application/octet-stream")
+
+    extractor = _pick_extractor(upload)
+
+    assert extractor is extract_text_from_pdf
+    assert extractor(upload) == "hello pdf"